@@ -16,7 +16,7 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
-import itertools
+import logging
 
 from typing import List
 
@@ -29,6 +29,16 @@ TICK_SIZE_IN_CENTS = 100
 MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 
+# plain module-level aliases so the handlers avoid enum class attribute lookups
+FUTURE = int(Instrument.FUTURE)
+ETF = int(Instrument.ETF)
+BUY = Side.BUY
+SELL = Side.SELL
+ASK = Side.ASK
+BID = Side.BID
+FILL_AND_KILL = Lifespan.FILL_AND_KILL
+GOOD_FOR_DAY = Lifespan.GOOD_FOR_DAY
+
 
 class AutoTrader(BaseAutoTrader):
     """Example Auto-trader.
@@ -43,13 +53,14 @@ class AutoTrader(BaseAutoTrader):
     def __init__(self, loop: asyncio.AbstractEventLoop, team_name: str, secret: str):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
-        self.order_ids = itertools.count(1)
+        self.last_oid = 0
         self.bids = set()
         self.asks = set()
         self.ask_id = self.ask_price = self.bid_id = self.bid_price = self.position = 0
         self.curr_best_bid = {}
         self.curr_best_ask = {}
-        self.curr_sequence = -1
+        self.book_sequence = [-1] * len(Instrument)  # last order book sequence number per instrument
+        self.ticks_sequence = [-1] * len(Instrument)  # last trade ticks sequence number per instrument
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
         """Called when the exchange detects an error.
@@ -80,87 +91,102 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
-        self.logger.info("received order book for instrument %d with sequence number %d", instrument,
-                         sequence_number)
-        self.logger.info("This best bid %d best ask %d", bid_prices[0], ask_prices[0])
-        self.logger.info("Curr best bids: %s", self.curr_best_bid)
-        self.logger.info("Curr best asks: %s", self.curr_best_ask)
-        if instrument == Instrument.ETF:
-            if (bid_prices[0] != 0) & (ask_prices[0] != 0): # I think this is error handling
-                if (((bid_prices[0] - TICK_SIZE_IN_CENTS) > self.curr_best_ask[Instrument.FUTURE])&
-                    (self.position > -POSITION_LIMIT)):
-                    # ETF too high
-                    this_id = next(self.order_ids)
-                    order_size = min(bid_volumes[0], self.position+POSITION_LIMIT)
-                    self.send_insert_order(this_id, Side.ASK, 
-                                           bid_prices[0], order_size, Lifespan.FILL_AND_KILL)
-                    self.logger.info("Sent IOC ASK for best_bid price %d volume %d id %d",
-                                     bid_prices[0], bid_volumes[0], this_id)
-                    new_bid_price = self.curr_best_ask[Instrument.FUTURE]
-                    new_ask_price = 0
-                    self.asks.add(this_id)
-                    
-                elif (((ask_prices[0] + TICK_SIZE_IN_CENTS) < self.curr_best_bid[Instrument.FUTURE])&
-                      (self.position < POSITION_LIMIT)):
-                    # ETF too low
-                    this_id = next(self.order_ids)
-                    order_size = min(bid_volumes[0], -self.position+POSITION_LIMIT)
-                    self.send_insert_order(this_id, Side.BUY, 
-                                           ask_prices[0], order_size, Lifespan.FILL_AND_KILL)
-                    self.logger.info("Sent IOC BUY for best_ask price %d volume %d id %d",
-                                     ask_prices[0], ask_volumes[0], this_id)
-                    new_ask_price = self.curr_best_bid[Instrument.FUTURE]
-                    new_bid_price = 0
-                    self.bids.add(this_id)
-                    
-                else:
-                    mid_price_future = (self.curr_best_ask[Instrument.FUTURE] + 
-                                        self.curr_best_bid[Instrument.FUTURE]) / 2.
-                    etf_bid_to_mid = abs(mid_price_future-bid_prices[0])
-                    etf_ask_to_mid = abs(mid_price_future-ask_prices[0])
-                    if etf_bid_to_mid > etf_ask_to_mid:
-                        # ETF slightly high
-                        new_bid_price = bid_prices[0] 
-                        new_ask_price = max(bid_prices[0]+TICK_SIZE_IN_CENTS,self.curr_best_ask[Instrument.FUTURE])
-                    else:
-                        # ETF slightly low
-                        new_ask_price = ask_prices[0] 
-                        new_bid_price = min(ask_prices[0]-TICK_SIZE_IN_CENTS,self.curr_best_bid[Instrument.FUTURE])
-                    
-            else:
-                new_bid_price = 0
+        log = self.logger
+        info_on = log.isEnabledFor(logging.INFO)
+        log.info("received order book for instrument %d with sequence number %d", instrument,
+                 sequence_number)
+        if instrument != ETF:
+            self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.book_sequence)
+            return
+        log.info("This best bid %d best ask %d", bid_prices[0], ask_prices[0])
+        if info_on:
+            log.info("Curr best bids: %s", self.curr_best_bid)
+            log.info("Curr best asks: %s", self.curr_best_ask)
+        best_ask_fut = self.curr_best_ask.get(FUTURE)
+        best_bid_fut = self.curr_best_bid.get(FUTURE)
+        pos = self.position
+        tick = TICK_SIZE_IN_CENTS
+        headroom_long = POSITION_LIMIT - pos
+        headroom_short = POSITION_LIMIT + pos
+        bp0 = bid_prices[0]
+        ap0 = ask_prices[0]
+        if best_ask_fut is None or best_bid_fut is None:
+            # nothing to price the ETF against until the future has been quoted on both sides
+            self.update_best_record(instrument, sequence_number, ap0, bp0, self.book_sequence)
+            return
+        if (bp0 != 0) & (ap0 != 0): # I think this is error handling
+            if ((bp0 - tick) > best_ask_fut) & (headroom_short > 0):
+                # ETF too high
+                this_id = self.next_order_id()
+                order_size = min(bid_volumes[0], headroom_short)
+                self.send_insert_order(this_id, ASK, 
+                                       bp0, order_size, FILL_AND_KILL)
+                log.info("Sent IOC ASK for best_bid price %d volume %d id %d",
+                         bp0, bid_volumes[0], this_id)
+                new_bid_price = best_ask_fut
                 new_ask_price = 0
-            
-            # ensure there is one pair of orders only
-            if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
-                self.send_cancel_order(self.bid_id)
-                self.logger.info("Cancelling bid %d", self.bid_id)
-                self.bid_id = 0
+                self.asks.add(this_id)
                 
-            if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
-                self.send_cancel_order(self.ask_id)
-                self.logger.info("Cancelling ask %d", self.ask_id)
-                self.ask_id = 0
+            elif ((ap0 + tick) < best_bid_fut) & (headroom_long > 0):
+                # ETF too low
+                this_id = self.next_order_id()
+                order_size = min(bid_volumes[0], headroom_long)
+                self.send_insert_order(this_id, BUY, 
+                                       ap0, order_size, FILL_AND_KILL)
+                log.info("Sent IOC BUY for best_ask price %d volume %d id %d",
+                         ap0, ask_volumes[0], this_id)
+                new_ask_price = best_bid_fut
+                new_bid_price = 0
+                self.bids.add(this_id)
+                
+            else:
+                # compare distances at twice scale so everything stays in integer cents
+                mid2_future = best_ask_fut + best_bid_fut
+                etf_bid_to_mid = abs(mid2_future - 2 * bp0)
+                etf_ask_to_mid = abs(mid2_future - 2 * ap0)
+                if etf_bid_to_mid > etf_ask_to_mid:
+                    # ETF slightly high
+                    new_bid_price = bp0 
+                    new_ask_price = max(bp0+tick,best_ask_fut)
+                else:
+                    # ETF slightly low
+                    new_ask_price = ap0 
+                    new_bid_price = min(ap0-tick,best_bid_fut)
+                
+        else:
+            new_bid_price = 0
+            new_ask_price = 0
+        
+        # ensure there is one pair of orders only
+        if self.bid_id != 0 and new_bid_price not in (self.bid_price, 0):
+            self.send_cancel_order(self.bid_id)
+            log.info("Cancelling bid %d", self.bid_id)
+            self.bid_id = 0
+            
+        if self.ask_id != 0 and new_ask_price not in (self.ask_price, 0):
+            self.send_cancel_order(self.ask_id)
+            log.info("Cancelling ask %d", self.ask_id)
+            self.ask_id = 0
 
-            if self.bid_id == 0 and new_bid_price != 0 and self.position < POSITION_LIMIT:
-                self.bid_id = next(self.order_ids)
-                self.bid_price = new_bid_price
-                order_size = min(LOT_SIZE, POSITION_LIMIT-self.position)
-                self.send_insert_order(self.bid_id, Side.BUY, new_bid_price, order_size, Lifespan.GOOD_FOR_DAY)
-                self.bids.add(self.bid_id)
-                self.logger.info("Sent limit BUY price %d volume %d id %d",
-                                     new_bid_price, LOT_SIZE, self.bid_id)
+        if self.bid_id == 0 and new_bid_price != 0 and headroom_long > 0:
+            self.bid_id = self.next_order_id()
+            self.bid_price = new_bid_price
+            order_size = min(LOT_SIZE, headroom_long)
+            self.send_insert_order(self.bid_id, BUY, new_bid_price, order_size, GOOD_FOR_DAY)
+            self.bids.add(self.bid_id)
+            log.info("Sent limit BUY price %d volume %d id %d",
+                     new_bid_price, LOT_SIZE, self.bid_id)
 
-            if self.ask_id == 0 and new_ask_price != 0 and self.position > -POSITION_LIMIT:
-                self.ask_id = next(self.order_ids)
-                self.ask_price = new_ask_price
-                order_size = min(LOT_SIZE, self.position+POSITION_LIMIT)
-                self.send_insert_order(self.ask_id, Side.SELL, new_ask_price, order_size, Lifespan.GOOD_FOR_DAY)
-                self.asks.add(self.ask_id)
-                self.logger.info("Sent limit SELL price %d volume %d id %d",
-                                     new_ask_price, LOT_SIZE, self.ask_id)
+        if self.ask_id == 0 and new_ask_price != 0 and headroom_short > 0:
+            self.ask_id = self.next_order_id()
+            self.ask_price = new_ask_price
+            order_size = min(LOT_SIZE, headroom_short)
+            self.send_insert_order(self.ask_id, SELL, new_ask_price, order_size, GOOD_FOR_DAY)
+            self.asks.add(self.ask_id)
+            log.info("Sent limit SELL price %d volume %d id %d",
+                     new_ask_price, LOT_SIZE, self.ask_id)
 
-        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0])
+        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.book_sequence)
 
 
     def on_order_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -174,11 +200,11 @@ class AutoTrader(BaseAutoTrader):
                          price, volume)
         if client_order_id in self.bids:
             self.position += volume
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            self.send_hedge_order(self.next_order_id(), ASK, MIN_BID_NEAREST_TICK, volume)
             self.logger.info("Hedging id %d by SELL future, at %d, volume %d", client_order_id, MIN_BID_NEAREST_TICK, volume)
         elif client_order_id in self.asks:
             self.position -= volume
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            self.send_hedge_order(self.next_order_id(), BID, MAX_ASK_NEAREST_TICK, volume)
             self.logger.info("Hedging id %d by BUY future, at %d, volume %d", client_order_id, MAX_ASK_NEAREST_TICK, volume)
 
     def on_order_status_message(self, client_order_id: int, fill_volume: int, remaining_volume: int,
@@ -217,11 +243,24 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received trade ticks for instrument %d with sequence number %d", instrument,
                          sequence_number)
-        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0])
+        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.ticks_sequence)
+
+    def next_order_id(self) -> int:
+        """Return a fresh client order id."""
+        self.last_oid += 1
+        return self.last_oid
 
-    def update_best_record(self, instrument: int, sequence:int, new_best_ask: int, new_best_bid: int) -> None:
-        """Update own record of best prices."""
-        self.curr_sequence = max(sequence, self.curr_sequence)
+    def update_best_record(self, instrument: int, sequence: int, new_best_ask: int, new_best_bid: int,
+                           last_sequence: List[int]) -> None:
+        """Update own record of best prices.
+
+        last_sequence holds the latest sequence number seen per instrument on
+        the stream the prices came from; anything not newer than that is
+        stale and ignored.
+        """
+        if sequence <= last_sequence[instrument]:
+            return
+        last_sequence[instrument] = sequence
         if new_best_ask != 0:
             self.curr_best_ask[instrument] = new_best_ask 
         if new_best_bid != 0:
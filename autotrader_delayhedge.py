@@ -16,13 +16,35 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
-import itertools
-import numpy as np
+import logging
 
-from typing import List
+from array import array
+
+from typing import List, Tuple
 
 from ready_trader_go import BaseAutoTrader, Instrument, Lifespan, MAXIMUM_ASK, MINIMUM_BID, Side
 
+try:
+    import cython
+    COMPILED = cython.compiled
+except ImportError:
+    COMPILED = False
+
+
+def no_jit(*args, **kwargs):
+    """Stand-in for numba.njit that leaves the function as it is."""
+    return lambda func: func
+
+
+if COMPILED:
+    # numba cannot JIT functions that Cython has already compiled
+    njit = no_jit
+else:
+    try:
+        from numba import njit
+    except ImportError:
+        njit = no_jit
+
 
 LOT_SIZE = 15
 POSITION_LIMIT = 90
@@ -31,6 +53,113 @@ MIN_BID_NEAREST_TICK = (MINIMUM_BID + TICK_SIZE_IN_CENTS) // TICK_SIZE_IN_CENTS
 MAX_ASK_NEAREST_TICK = MAXIMUM_ASK // TICK_SIZE_IN_CENTS * TICK_SIZE_IN_CENTS
 NLADDER = 3
 SPREAD = 3
+BID_OFFSETS = tuple(i * TICK_SIZE_IN_CENTS for i in range(0, -NLADDER, -1))
+ASK_OFFSETS = tuple(i * TICK_SIZE_IN_CENTS for i in range(0, NLADDER))
+# ladder price adjustment for every position from -POSITION_LIMIT to POSITION_LIMIT
+PRICE_ADJUSTMENTS = tuple(-(p // 40) * TICK_SIZE_IN_CENTS for p in range(-POSITION_LIMIT, POSITION_LIMIT + 1))
+NO_ORDER = 0
+BID_ORDER = 1
+ASK_ORDER = 2
+
+# plain module-level aliases so the handlers avoid enum class attribute lookups
+FUTURE = int(Instrument.FUTURE)
+ETF = int(Instrument.ETF)
+BUY = Side.BUY
+SELL = Side.SELL
+ASK = Side.ASK
+BID = Side.BID
+FILL_AND_KILL = Lifespan.FILL_AND_KILL
+GOOD_FOR_DAY = Lifespan.GOOD_FOR_DAY
+
+
+@njit(cache=True)
+def compute_ladders(bp0: int, ap0: int, best_bid_fut: int, best_ask_fut: int, position: int,
+                    n_bids: int, n_asks: int) -> Tuple[int, int, int, int]:
+    """Work out where and how big the passive ladders should be.
+
+    Returns the top-of-ladder bid and ask prices, already adjusted for the
+    current position, followed by the per-rung bid and ask sizes. The
+    remaining rungs sit at BID_OFFSETS and ASK_OFFSETS from the top.
+    """
+    if -POSITION_LIMIT <= position <= POSITION_LIMIT:
+        price_adjustment = PRICE_ADJUSTMENTS[position + POSITION_LIMIT]
+    else:
+        # resting orders can still fill after the position passes our own limit
+        price_adjustment = - (position // 40) * TICK_SIZE_IN_CENTS
+    # compare distances at twice scale so everything stays in integer cents
+    mid2_future = best_ask_fut + best_bid_fut
+    etf_bid_to_mid = abs(mid2_future - 2 * bp0)
+    etf_ask_to_mid = abs(mid2_future - 2 * ap0)
+    if etf_bid_to_mid > etf_ask_to_mid:
+        # ETF slightly high
+        # ----
+        #       -**-
+        # -**-  ----
+        # ETF   FUTURE
+        bid_base = bp0
+        ask_base = max(bp0+TICK_SIZE_IN_CENTS,best_ask_fut)
+    else:
+        # ETF slightly low
+        #       ----
+        # -**-
+        # ----  -**-
+        # ETF   FUTURE
+        ask_base = ap0
+        bid_base = min(ap0-TICK_SIZE_IN_CENTS,best_bid_fut)
+    headroom_long = POSITION_LIMIT - position
+    headroom_short = POSITION_LIMIT + position
+    bid_budget = (LOT_SIZE * n_bids) // NLADDER
+    ask_budget = (LOT_SIZE * n_asks) // NLADDER
+    bid_size = min(LOT_SIZE, headroom_long - bid_budget) // NLADDER
+    ask_size = min(LOT_SIZE, headroom_short - ask_budget) // NLADDER
+    return bid_base + price_adjustment, ask_base + price_adjustment, bid_size, ask_size
+
+
+class OrderTable:
+    """Own live orders held as parallel arrays indexed by client order id.
+
+    Client order ids are handed out consecutively from one, so the id is
+    used directly as the slot. side holds NO_ORDER for a slot until the
+    order is added and again once its final status arrives. resting lists,
+    per side code, the ladder orders that are quoted and not yet cancelled.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """Initialise a new instance of the OrderTable class."""
+        capacity = max(capacity, 1)  # add() grows by doubling, so it cannot start empty
+        self.price = array("i")
+        self.price.frombytes(bytes(self.price.itemsize * capacity))
+        self.side = bytearray(capacity)
+        self.live = [0, 0, 0]  # live order count per side code
+        self.resting = ([], [], [])  # resting ladder oids per side code
+
+    def add(self, client_order_id: int, side: int, price: int, resting: bool) -> None:
+        """Record a new order, growing the arrays as needed."""
+        while client_order_id >= len(self.side):
+            self.price.frombytes(bytes(self.price.itemsize * len(self.side)))
+            self.side.extend(bytes(len(self.side)))
+        self.price[client_order_id] = price
+        self.side[client_order_id] = side
+        self.live[side] += 1
+        if resting:
+            self.resting[side].append(client_order_id)
+
+    def side_of(self, client_order_id: int) -> int:
+        """Return the side code of a live order, or NO_ORDER if it is not live."""
+        if client_order_id < len(self.side):
+            return self.side[client_order_id]
+        return NO_ORDER
+
+    def remove(self, client_order_id: int) -> None:
+        """Forget an order once it has completely filled or been cancelled."""
+        side = self.side_of(client_order_id)
+        if side != NO_ORDER:
+            self.side[client_order_id] = NO_ORDER
+            self.live[side] -= 1
+            resting = self.resting[side]
+            if client_order_id in resting:
+                resting.remove(client_order_id)
+
 
 class AutoTrader(BaseAutoTrader):
     """Example Auto-trader.
@@ -45,15 +174,13 @@ class AutoTrader(BaseAutoTrader):
     def __init__(self, loop: asyncio.AbstractEventLoop, team_name: str, secret: str):
         """Initialise a new instance of the AutoTrader class."""
         super().__init__(loop, team_name, secret)
-        self.order_ids = itertools.count(1)
-        self.bids = {}
-        self.asks = {}
+        self.last_oid = 0
+        self.orders = OrderTable()
         self.position = self.position_future = 0
         self.curr_best_bid = {}
         self.curr_best_ask = {}
-        self.curr_sequence = -1
-        self.ask_prices = {}
-        self.bid_prices = {}
+        self.book_sequence = [-1] * len(Instrument)  # last order book sequence number per instrument
+        self.ticks_sequence = [-1] * len(Instrument)  # last trade ticks sequence number per instrument
         self.hedge_timer = 0
 
     def on_error_message(self, client_order_id: int, error_message: bytes) -> None:
@@ -63,7 +190,7 @@ class AutoTrader(BaseAutoTrader):
         will identify that order, otherwise the client_order_id will be zero.
         """
         self.logger.warning("error with order %d: %s", client_order_id, error_message.decode())
-        if client_order_id != 0 and (client_order_id in self.bids or client_order_id in self.asks):
+        if client_order_id != 0 and self.orders.side_of(client_order_id) != NO_ORDER:
             self.on_order_status_message(client_order_id, 0, 0, 0)
 
     def on_hedge_filled_message(self, client_order_id: int, price: int, volume: int) -> None:
@@ -85,115 +212,87 @@ class AutoTrader(BaseAutoTrader):
         prices are reported along with the volume available at each of those
         price levels.
         """
-        self.logger.info("received order book for instrument %d with sequence number %d", instrument,
-                         sequence_number)
-        # self.logger.info("This best bid %d best ask %d", bid_prices[0], ask_prices[0])
-        self.logger.info("Curr best bids: %s", self.curr_best_bid)
-        # self.logger.info("Curr best asks: %s", self.curr_best_ask)
-        # self.logger.info("Active bids %s", self.bids)
-        # self.logger.info("Active asks %s", self.asks)
-        price_adjustment = - (self.position // 40) * TICK_SIZE_IN_CENTS
-        if instrument == Instrument.ETF:
-            if (bid_prices[0] != 0) & (ask_prices[0] != 0): # I think this is error handling
-                if (((bid_prices[0] - TICK_SIZE_IN_CENTS) > self.curr_best_ask[Instrument.FUTURE])&
-                    (self.position > -POSITION_LIMIT)):
-                    # ETF too high
-                    this_id = next(self.order_ids)
-                    order_size = min(bid_volumes[0], self.position+POSITION_LIMIT,LOT_SIZE)
-                    self.send_insert_order(this_id, Side.ASK, 
-                                           bid_prices[0], order_size, Lifespan.FILL_AND_KILL)
-                    self.logger.info("Sent IOC ASK for best_bid price %d volume %d id %d",
-                                     bid_prices[0], bid_volumes[0], this_id)
-                    new_bid_price = []#self.curr_best_ask[Instrument.FUTURE]
-                    new_ask_price = []
-                    self.asks[this_id] = bid_prices[0]
-                    
-                elif (((ask_prices[0] + TICK_SIZE_IN_CENTS) < self.curr_best_bid[Instrument.FUTURE])&
-                      (self.position < POSITION_LIMIT)):
-                    # ETF too low
-                    this_id = next(self.order_ids)
-                    order_size = min(bid_volumes[0], -self.position+POSITION_LIMIT,LOT_SIZE)
-                    self.send_insert_order(this_id, Side.BUY, 
-                                           ask_prices[0], order_size, Lifespan.FILL_AND_KILL)
-                    self.logger.info("Sent IOC BUY for best_ask price %d volume %d id %d",
-                                     ask_prices[0], ask_volumes[0], this_id)
-                    new_ask_price = []#self.curr_best_bid[Instrument.FUTURE]
-                    new_bid_price = []
-                    self.bids[this_id] = ask_prices[0]
-                    
-                else:
-                    mid_price_future = (self.curr_best_ask[Instrument.FUTURE] + 
-                                        self.curr_best_bid[Instrument.FUTURE]) / 2.
-                    etf_bid_to_mid = abs(mid_price_future-bid_prices[0])
-                    etf_ask_to_mid = abs(mid_price_future-ask_prices[0])
-                    if etf_bid_to_mid > etf_ask_to_mid:
-                        # ETF slightly high
-                        # ----
-                        #       -**-
-                        # -**-  ----
-                        # ETF   FUTURE  
-                        new_bid_price = list(bid_prices[0]+np.arange(0,-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
-                        new_ask_price = list(max(bid_prices[0]+TICK_SIZE_IN_CENTS,self.curr_best_ask[Instrument.FUTURE])+\
-                                        np.arange(0,NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
-                    else:
-                        # ETF slightly low
-                        #       ----
-                        # -**-  
-                        # ----  -**-
-                        # ETF   FUTURE 
-                        new_ask_price = list(ask_prices[0]+np.arange(0,NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
-                        new_bid_price = list(min(ask_prices[0]-TICK_SIZE_IN_CENTS,self.curr_best_bid[Instrument.FUTURE])+\
-                                        np.arange(0,-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
-                    
-            # elif (bid_prices[0] != 0) and (ask_prices[0] == 0):
-            #     new_ask_price = list(ask_prices[0]+np.arange(0,NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
-            #     new_bid_price = list(ask_prices[0]+np.arange(-SPREAD,-SPREAD-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
-            # elif (bid_prices[0] == 0) and (ask_prices[0] != 0):
-            #     new_ask_price = list(bid_prices[0]+np.arange(SPREAD,SPREAD+NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
-            #     new_bid_price = list(bid_prices[0]+np.arange(0,-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
+        log = self.logger
+        info_on = log.isEnabledFor(logging.INFO)
+        log.info("received order book for instrument %d with sequence number %d", instrument,
+                 sequence_number)
+        if instrument != ETF:
+            self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.book_sequence)
+            self.hedge_timer += 1
+            return
+        if info_on:
+            log.info("Curr best bids: %s", self.curr_best_bid)
+        best_ask_fut = self.curr_best_ask.get(FUTURE)
+        best_bid_fut = self.curr_best_bid.get(FUTURE)
+        pos = self.position
+        tick = TICK_SIZE_IN_CENTS
+        headroom_long = POSITION_LIMIT - pos
+        headroom_short = POSITION_LIMIT + pos
+        bp0 = bid_prices[0]
+        ap0 = ask_prices[0]
+        if best_ask_fut is None or best_bid_fut is None:
+            # nothing to price the ETF against until the future has been quoted on both sides
+            self.update_best_record(instrument, sequence_number, ap0, bp0, self.book_sequence)
+            self.hedge_timer += 1
+            return
+        bid_size = ask_size = 0
+        # orders are queued here and sent together, cancels first, once the ladders are settled
+        cancels = []
+        inserts = []
+        if (bp0 != 0) & (ap0 != 0): # I think this is error handling
+            if ((bp0 - tick) > best_ask_fut) & (headroom_short > 0):
+                # ETF too high
+                this_id = self.next_order_id()
+                order_size = min(bid_volumes[0], headroom_short,LOT_SIZE)
+                inserts.append((this_id, ASK, bp0, order_size, FILL_AND_KILL))
+                log.info("Sent IOC ASK for best_bid price %d volume %d id %d",
+                         bp0, bid_volumes[0], this_id)
+                new_bid_price = ()#self.curr_best_ask[Instrument.FUTURE]
+                new_ask_price = ()
+                self.orders.add(this_id, ASK_ORDER, bp0, False)
+                
+            elif ((ap0 + tick) < best_bid_fut) & (headroom_long > 0):
+                # ETF too low
+                this_id = self.next_order_id()
+                order_size = min(bid_volumes[0], headroom_long,LOT_SIZE)
+                inserts.append((this_id, BUY, ap0, order_size, FILL_AND_KILL))
+                log.info("Sent IOC BUY for best_ask price %d volume %d id %d",
+                         ap0, ask_volumes[0], this_id)
+                new_ask_price = ()#self.curr_best_bid[Instrument.FUTURE]
+                new_bid_price = ()
+                self.orders.add(this_id, BID_ORDER, ap0, False)
+                
             else:
-                new_bid_price = []
-                new_ask_price = []
-
-            self.logger.info("This step asks %s, bids %s", new_ask_price, new_bid_price)
-
-
-
-            for price, oid in self.ask_prices.items():
-                if price in new_ask_price:
-                    new_ask_price.remove(price)
-                else:
-                    self.send_cancel_order(self.ask_prices[price])
-                    self.logger.info("Cancelling ask %d", self.ask_prices[price])
-
-            for price, oid in self.bid_prices.items():
-                if price in new_bid_price:
-                    new_bid_price.remove(price)
-                else:
-                    self.send_cancel_order(self.bid_prices[price])
-                    self.logger.info("Cancelling ask %d", self.bid_prices[price])
-             # leave deletion to status update
-
-   
-            bid_size = min(LOT_SIZE, POSITION_LIMIT-self.position-len(self.bids)*LOT_SIZE//NLADDER) // NLADDER
-            ask_size = min(LOT_SIZE, self.position+POSITION_LIMIT-len(self.asks)*LOT_SIZE//NLADDER) // NLADDER
-            if bid_size > 0 and len(new_bid_price)>0:
-                for price in new_bid_price:
-                    oid = next(self.order_ids)
-                    self.send_insert_order(oid, Side.BUY, price, bid_size, Lifespan.GOOD_FOR_DAY)
-                    self.bid_prices[price] = oid
-                    self.bids[oid] = price
-                    self.logger.info("Sent limit BUY price %d volume %d id %d",price, LOT_SIZE,oid)
-
-            if ask_size > 0 and len(new_ask_price)>0:
-                for price in new_ask_price:
-                    oid = next(self.order_ids)
-                    self.send_insert_order(oid, Side.SELL, price, ask_size, Lifespan.GOOD_FOR_DAY)
-                    self.ask_prices[price] = oid
-                    self.asks[oid] = price
-                    self.logger.info("Sent limit SELL price %d volume %d id %d",price, LOT_SIZE,oid)
-
-        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0])
+                bid_base, ask_base, bid_size, ask_size = compute_ladders(
+                    bp0, ap0, best_bid_fut, best_ask_fut, pos, self.orders.live[BID_ORDER],
+                    self.orders.live[ASK_ORDER])
+                # the book prices and the kernel's results are plain ints, so the rung prices
+                # compared against the order table never become numpy scalars
+                new_bid_price = tuple(bid_base + o for o in BID_OFFSETS)
+                new_ask_price = tuple(ask_base + o for o in ASK_OFFSETS)
+                
+        # elif (bid_prices[0] != 0) and (ask_prices[0] == 0):
+        #     new_ask_price = list(ask_prices[0]+np.arange(0,NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
+        #     new_bid_price = list(ask_prices[0]+np.arange(-SPREAD,-SPREAD-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
+        # elif (bid_prices[0] == 0) and (ask_prices[0] != 0):
+        #     new_ask_price = list(bid_prices[0]+np.arange(SPREAD,SPREAD+NLADDER)*TICK_SIZE_IN_CENTS+price_adjustment)
+        #     new_bid_price = list(bid_prices[0]+np.arange(0,-NLADDER,-1)*TICK_SIZE_IN_CENTS+price_adjustment)
+        else:
+            new_bid_price = ()
+            new_ask_price = ()
+
+        if info_on:
+            log.info("This step asks %s, bids %s", new_ask_price, new_bid_price)
+
+        self.reconcile_side(BUY, new_bid_price, bid_size, cancels, inserts)
+        self.reconcile_side(SELL, new_ask_price, ask_size, cancels, inserts)
+
+        for oid in cancels:
+            self.send_cancel_order(oid)
+        for oid, side, price, volume, lifespan in inserts:
+            self.send_insert_order(oid, side, price, volume, lifespan)
+
+        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.book_sequence)
         self.hedge_timer += 1
 
 
@@ -206,14 +305,15 @@ class AutoTrader(BaseAutoTrader):
         """
         self.logger.info("received order filled for order %d with price %d and volume %d", client_order_id,
                          price, volume)
-        if client_order_id in self.bids.keys():
+        side = self.orders.side_of(client_order_id)
+        if side == BID_ORDER:
             self.position += volume
-            # self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, volume)
+            # self.send_hedge_order(self.next_order_id(), Side.ASK, MIN_BID_NEAREST_TICK, volume)
             # self.logger.info("Hedging id %d by SELL future, at %d, volume %d", client_order_id, MIN_BID_NEAREST_TICK, volume)
             # self.position_future -= volume
-        elif client_order_id in self.asks.keys():
+        elif side == ASK_ORDER:
             self.position -= volume
-            # self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, volume)
+            # self.send_hedge_order(self.next_order_id(), Side.BID, MAX_ASK_NEAREST_TICK, volume)
             # self.logger.info("Hedging id %d by BUY future, at %d, volume %d", client_order_id, MAX_ASK_NEAREST_TICK, volume)
             # self.position_future += volume
         else:
@@ -238,10 +338,8 @@ class AutoTrader(BaseAutoTrader):
             # elif client_order_id == self.ask_id:
             #     self.ask_id = 0
 
-            # It could be either a bid or an ask
-            price = max(self.bids.pop(client_order_id, -1), self.asks.pop(client_order_id, -1))
-            self.bid_prices.pop(price,0)
-            self.ask_prices.pop(price,0)
+            # the price may already have been re-quoted under a newer order
+            self.orders.remove(client_order_id)
             
 
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
@@ -259,7 +357,7 @@ class AutoTrader(BaseAutoTrader):
                          sequence_number)
         delta_position = self.position+self.position_future
         self.logger.info("Current position ETF %d Future %d", self.position, self.position_future)
-        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0])
+        self.update_best_record(instrument, sequence_number, ask_prices[0], bid_prices[0], self.ticks_sequence)
 
         self.hedge_timer=0
         if self.hedge_timer <60:
@@ -268,22 +366,68 @@ class AutoTrader(BaseAutoTrader):
         #     multiplier = 1
         else:
             multiplier = 0
-        if ((self.curr_best_bid[Instrument.ETF] - self.curr_best_ask[Instrument.FUTURE]) > multiplier*TICK_SIZE_IN_CENTS)\
+        if ((self.curr_best_bid[ETF] - self.curr_best_ask[FUTURE]) > multiplier*TICK_SIZE_IN_CENTS)\
             and delta_position<0:
             self.logger.info("Hedging by BUY future, at %d, volume %d", MAX_ASK_NEAREST_TICK, -delta_position)
-            self.send_hedge_order(next(self.order_ids), Side.BID, MAX_ASK_NEAREST_TICK, -delta_position)
+            self.send_hedge_order(self.next_order_id(), BID, MAX_ASK_NEAREST_TICK, -delta_position)
             self.position_future += -delta_position
             self.hedge_timer=0
-        if ((self.curr_best_bid[Instrument.FUTURE] - self.curr_best_ask[Instrument.ETF]) > multiplier*TICK_SIZE_IN_CENTS)\
+        if ((self.curr_best_bid[FUTURE] - self.curr_best_ask[ETF]) > multiplier*TICK_SIZE_IN_CENTS)\
             and delta_position>0:
             self.logger.info("Hedging by SELL future, at %d, volume %d", MIN_BID_NEAREST_TICK, delta_position)
-            self.send_hedge_order(next(self.order_ids), Side.ASK, MIN_BID_NEAREST_TICK, delta_position)
+            self.send_hedge_order(self.next_order_id(), ASK, MIN_BID_NEAREST_TICK, delta_position)
             self.position_future -= delta_position
             self.hedge_timer=0
 
-    def update_best_record(self, instrument: int, sequence:int, new_best_ask: int, new_best_bid: int) -> None:
-        """Update own record of best prices."""
-        self.curr_sequence = max(sequence, self.curr_sequence)
+    def reconcile_side(self, side: Side, desired_prices: Tuple[int, ...], size: int, cancels: List[int],
+                       inserts: List[Tuple[int, Side, int, int, Lifespan]]) -> None:
+        """Bring one side of the resting ladder in line with the desired prices.
+
+        Resting orders at prices that are no longer wanted are cancelled and
+        stop resting straight away; they stay live in the order table until
+        the status update so late fills are still accounted for. Missing
+        prices are then quoted with the given size. Nothing is sent here: the
+        cancels and inserts are appended to the given lists for the caller to
+        send.
+        """
+        orders = self.orders
+        code = BID_ORDER if side == BUY else ASK_ORDER
+        resting = orders.resting[code]
+        quoted = []
+        for oid in resting:
+            if orders.price[oid] in desired_prices:
+                quoted.append(oid)
+            else:
+                cancels.append(oid)
+                self.logger.info("Cancelling %s %d", "bid" if side == BUY else "ask", oid)
+        resting[:] = quoted
+
+        if size > 0:
+            quoted_prices = [orders.price[oid] for oid in quoted]
+            for price in desired_prices:
+                if price in quoted_prices:
+                    continue
+                oid = self.next_order_id()
+                inserts.append((oid, side, price, size, GOOD_FOR_DAY))
+                orders.add(oid, code, price, True)
+                self.logger.info("Sent limit %s price %d volume %d id %d", side.name, price, size, oid)
+
+    def next_order_id(self) -> int:
+        """Return a fresh client order id."""
+        self.last_oid += 1
+        return self.last_oid
+
+    def update_best_record(self, instrument: int, sequence: int, new_best_ask: int, new_best_bid: int,
+                           last_sequence: List[int]) -> None:
+        """Update own record of best prices.
+
+        last_sequence holds the latest sequence number seen per instrument on
+        the stream the prices came from; anything not newer than that is
+        stale and ignored.
+        """
+        if sequence <= last_sequence[instrument]:
+            return
+        last_sequence[instrument] = sequence
         if new_best_ask != 0:
             self.curr_best_ask[instrument] = new_best_ask 
         if new_best_bid != 0:
@@ -0,0 +1,15 @@
+"""Compile the auto-traders with Cython.
+
+Run "python3 setup.py build_ext --inplace" from this directory. The compiled
+extension modules sit next to the .py files and are picked up in their place
+when rtg.py imports an auto-trader by name; delete them to go back to the
+plain Python sources.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="trumpington-grandma-autotraders",
+    ext_modules=cythonize(["autotrader1.py", "autotrader_delayhedge.py"],
+                          compiler_directives={"language_level": "3"}),
+)